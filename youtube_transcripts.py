@@ -1,8 +1,14 @@
 import os
 import json
+import asyncio
 import logging
+import logging.handlers
+import queue
+import atexit
 import argparse
-import requests
+import random
+import threading
+import httplib2
 from dotenv import load_dotenv
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
@@ -11,15 +17,47 @@ from pathlib import Path
 from youtube_transcript_api import YouTubeTranscriptApi
 import re
 
+# TooManyRequests only exists before youtube-transcript-api 1.0, rate limit errors are otherwise matched by message
+try:
+    from youtube_transcript_api import TooManyRequests
+except ImportError:
+    TooManyRequests = None
+
+# orjson is optional, the standard json module is used when it is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Load YouTube API key from .env file
 load_dotenv()
 YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
 YOUTUBE_CHANNEL_URL = "https://www.youtube.com/@"
 YOUTUBE_VIDEO_URL = "https://www.youtube.com/watch?v="
+TITLE_STRIP_PATTERN = re.compile(r'[^\w\s-]')
+TITLE_DASH_PATTERN = re.compile(r'[-\s]+')
+RATE_LIMIT_ERROR_PATTERN = re.compile(r'429|quota|rate.?limit', re.I)
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+ISO_DURATION_PATTERN = re.compile(r'P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+SHORTS_MAX_DURATION = 60
+VIDEOS_PER_REQUEST = 50
+API_MAX_RETRIES = 3
+WRITE_BUFFER_SIZE = 1 << 20
 
 if not YOUTUBE_API_KEY:
     raise ValueError("YouTube API key not found. Please set it in the .env file.")
 
+# Class to format log records as JSON objects, one per line
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        return json_bytes({
+            "time": self.formatTime(record),
+            "name": record.name,
+            "level": record.levelname,
+            "message": record.getMessage()
+        }).decode('utf-8')
+
 # Function to setup logging
 def setup_logging(log_level, log_format, log_file, console_logging):
     log_levels = {
@@ -31,131 +69,371 @@ def setup_logging(log_level, log_format, log_file, console_logging):
     }
     level = log_levels.get(log_level.upper(), logging.INFO)
     
-    log_format_plain = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    log_format_json = json.dumps({
-        "time": "%(asctime)s",
-        "name": "%(name)s",
-        "level": "%(levelname)s",
-        "message": "%(message)s"
-    })
-    
-    log_format_str = log_format_json if log_format == 'json' else log_format_plain
+    if log_format == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     
     log_file.parent.mkdir(parents=True, exist_ok=True)
-    logging.basicConfig(level=level, format=log_format_str, filename=log_file, filemode='a')
+    file_handler = logging.FileHandler(log_file, mode='a')
+    file_handler.setFormatter(formatter)
+    handlers = [file_handler]
     
     if console_logging:
         console = logging.StreamHandler()
         console.setLevel(level)
-        formatter = logging.Formatter(log_format_str)
         console.setFormatter(formatter)
-        logging.getLogger('').addHandler(console)
+        handlers.append(console)
+    
+    # Log records are queued and written by a background thread so logging never blocks the downloads
+    log_queue = queue.Queue(-1)
+    root_logger = logging.getLogger('')
+    root_logger.setLevel(level)
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
     
     # Suppress specific module warnings
     logging.getLogger('googleapiclient.discovery_cache').setLevel(logging.ERROR)
     logging.getLogger('google.auth.compute_engine._metadata').setLevel(logging.ERROR)
     logging.getLogger('google.auth._default').setLevel(logging.ERROR)
+    
+    return listener
+
+# Class to space out API calls so that at most `rate` calls start per second
+class AsyncRateLimiter:
+    def __init__(self, rate):
+        self.min_interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot = 0.0
+        self.lock = None
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            sleep = max(0.0, self.next_slot - loop.time())
+            if sleep:
+                await asyncio.sleep(sleep)
+            self.next_slot = loop.time() + self.min_interval
 
 # Function to create YouTube API client
-def get_youtube_client():
-    return build('youtube', 'v3', developerKey=YOUTUBE_API_KEY)
-
-# Function to get the channel ID from channel name
-def get_channel_id(channel_name):
-    url = "https://www.youtube.com/@" + channel_name
-    r = requests.get(url)
-    logging.debug(f"Fetching channel ID from URL: {url}")
-    if r.status_code != 200:
-        logging.error(f"Failed to fetch channel page. Status code: {r.status_code}")
-        raise Exception(f"Failed to fetch channel page. Status code: {r.status_code}")
-    text = r.text
-    channel_id = text.split("youtube.com/channel/")[1].split('">')[0]
-    logging.debug(f"Channel ID: {channel_id}")
-    return channel_id
+# The discovery document bundled with google-api-python-client is used, so no HTTP request is made at startup
+def get_youtube_client(timeout):
+    return build('youtube', 'v3', developerKey=YOUTUBE_API_KEY, http=httplib2.Http(timeout=timeout), static_discovery=True)
 
-# Function to fetch video IDs of the videos in the uploads playlist of a channel
-def fetch_video_ids(youtube, channel_name, max_videos, include_shorts):
-    channel_id = get_channel_id(channel_name)
-    base_url = "https://www.googleapis.com/youtube/v3/channels"
-    params = {"part": "contentDetails", "id": channel_id, "key": YOUTUBE_API_KEY}
-    
-    try:
-        response = requests.get(base_url, params=params)
-        response = json.loads(response.content)
-    except HttpError as e:
-        logging.error(f"An HTTP error occurred: {e}")
-        return []
+# Each worker thread keeps its own HTTP connection, httplib2 connections are not thread-safe
+thread_local = threading.local()
 
-    if "items" not in response or not response["items"]:
-        raise Exception(f"No playlist found for {channel_name}")
+# Function to execute a YouTube API request in a worker thread
+# The connection is reused by later requests on the same thread, and 429/5xx responses are retried with backoff
+async def execute_request(request, limiter):
+    def execute():
+        if not hasattr(thread_local, 'http'):
+            thread_local.http = httplib2.Http(timeout=request.http.timeout)
+        return request.execute(http=thread_local.http, num_retries=API_MAX_RETRIES)
+    await limiter.acquire()
+    return await asyncio.to_thread(execute)
 
-    playlist_id = response["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
-    videos = []
+# Function to get the channel ID and uploads playlist ID from channel name, or None if the channel does not exist
+async def get_channel_id(youtube, channel_name, limiter):
+    logging.debug(f"Fetching channel ID for handle: @{channel_name}")
+    response = await execute_request(youtube.channels().list(
+        part="contentDetails",
+        forHandle=channel_name
+    ), limiter)
+    if not response.get("items"):
+        logging.debug(f"No channel found for handle: @{channel_name}")
+        return None
+    channel = response["items"][0]
+    channel_id = channel["id"]
+    playlist_id = channel["contentDetails"]["relatedPlaylists"]["uploads"]
+    logging.debug(f"Channel ID: {channel_id}, uploads playlist ID: {playlist_id}")
+    return channel_id, playlist_id
+
+# Function to convert an ISO 8601 duration (e.g. PT1M30S) to seconds
+def parse_duration(duration):
+    match = ISO_DURATION_PATTERN.match(duration)
+    if not match:
+        return None
+    days, hours, minutes, seconds = (int(value or 0) for value in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+# Function to drop YouTube Shorts from a list of videos based on their duration
+async def filter_shorts(youtube, videos, limiter):
+    chunks = [videos[i:i + VIDEOS_PER_REQUEST] for i in range(0, len(videos), VIDEOS_PER_REQUEST)]
+    responses = await asyncio.gather(*[
+        execute_request(youtube.videos().list(
+            part="contentDetails",
+            id=",".join(video["ID"] for video in chunk)
+        ), limiter)
+        for chunk in chunks
+    ])
+
+    durations = {}
+    for response in responses:
+        for item in response["items"]:
+            durations[item["id"]] = parse_duration(item["contentDetails"]["duration"])
+
+    # Videos without a known duration are kept, the transcript download will report them if needed
+    # Live and upcoming broadcasts report a duration of P0D, so a zero duration is treated as unknown too
+    return [
+        video for video in videos
+        if not durations.get(video["ID"]) or durations[video["ID"]] > SHORTS_MAX_DURATION
+    ]
+
+# Function to fetch the videos in the uploads playlist of a channel, yielding them one page at a time
+async def fetch_video_pages(youtube, playlist_id, max_videos, include_shorts, limiter):
+    found = 0
     next_page_token = None
 
     print("Scanning channel for videos...")
 
     while True:
-        playlist_items_response = youtube.playlistItems().list(
+        # Only request as many items as still needed, oversampling when Shorts will be filtered out
+        remaining = max_videos - found
+        if include_shorts:
+            page_size = min(VIDEOS_PER_REQUEST, max(remaining, 1))
+        else:
+            page_size = min(VIDEOS_PER_REQUEST, max(remaining * 2, 5))
+
+        playlist_items_response = await execute_request(youtube.playlistItems().list(
             part="snippet",
             playlistId=playlist_id,
-            maxResults=50,
+            maxResults=page_size,
             pageToken=next_page_token
-        ).execute()
-        logging.debug(f"Playlist items response: {playlist_items_response}")
+        ), limiter)
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug("Playlist items response: %s", playlist_items_response)
 
-        for video in playlist_items_response["items"]:
-            if include_shorts or 'shorts' not in video["snippet"]["title"].lower():
-                videos.append({
-                    "ID": video["snippet"]["resourceId"]["videoId"],
-                    "Title": video["snippet"]["title"],
-                    "Date": video["snippet"]["publishedAt"]
-                })
+        page_videos = [{
+            "ID": video["snippet"]["resourceId"]["videoId"],
+            "Title": video["snippet"]["title"],
+            "Date": video["snippet"]["publishedAt"]
+        } for video in playlist_items_response["items"]]
+
+        # Shorts are filtered page by page so the max_videos check below counts only kept videos
+        if not include_shorts:
+            page_videos = await filter_shorts(youtube, page_videos, limiter)
+        page_videos = page_videos[:max(remaining, 0)]
+        found += len(page_videos)
+        if page_videos:
+            yield page_videos
 
         next_page_token = playlist_items_response.get("nextPageToken")
 
-        if not next_page_token or len(videos) >= max_videos:
+        if not next_page_token or found >= max_videos:
             break
 
-    print(f"Discovered {len(videos)} videos.")
-    logging.debug(f"Fetched videos: {videos}")
-    return videos[:max_videos]
+    print(f"Discovered {found} videos.")
+
+# Function to fetch video IDs of the videos in the uploads playlist of a channel
+async def fetch_video_ids(youtube, playlist_id, max_videos, include_shorts, limiter):
+    videos = []
+    async for page_videos in fetch_video_pages(youtube, playlist_id, max_videos, include_shorts, limiter):
+        videos.extend(page_videos)
+    if logging.root.isEnabledFor(logging.DEBUG):
+        logging.debug("Fetched videos: %s", videos)
+    return videos
 
 # Function to normalize the video title for filenames
 def normalize_title(title):
-    title = re.sub(r'[^\w\s-]', '', title).strip().lower()
-    title = re.sub(r'[-\s]+', '-', title)
-    return title
+    return TITLE_DASH_PATTERN.sub('-', TITLE_STRIP_PATTERN.sub('', title).strip().lower())
+
+# Function to convert a YouTube timestamp (YYYY-MM-DDTHH:MM:SSZ) to YYYYMMDD
+def format_date(video_date):
+    date_str = video_date[:10].replace('-', '')
+    if len(date_str) != 8 or not date_str.isdigit():
+        raise ValueError(f"Unexpected video date format: {video_date}")
+    return date_str
+
+# Function to encode a value as UTF-8 JSON bytes
+def json_bytes(value):
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+# Function to write a transcript to disk in the requested format
+def write_transcript(file_path, video_id, video_title, transcript, format, include_timecodes):
+    # Write to a temporary file first so an interrupted write never looks like a finished download
+    # Different titles can normalize to the same file name, so the video ID keeps concurrent writers apart
+    tmp_path = f"{file_path}.{video_id}.part"
+    try:
+        if format == 'json':
+            with open(tmp_path, 'wb') as file:
+                # Write one cue at a time so the encoded transcript is never held in memory as a whole
+                file.write(b'{"title": ' + json_bytes(video_title) + b', "transcript": [\n')
+                for i, line in enumerate(transcript):
+                    if i:
+                        file.write(b',\n')
+                    file.write(b'    ' + json_bytes(line))
+                file.write(b'\n]}\n')
+        else:
+            with open(tmp_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as file:
+                file.write(f"Title: {video_title}\n\n")
+                if include_timecodes:
+                    file.writelines(f"{line['start']} - {line['text']}\n" for line in transcript)
+                else:
+                    file.writelines(f"{line['text']}\n" for line in transcript)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+# Function to check whether an error was caused by YouTube throttling the requests
+def is_rate_limit_error(error):
+    if TooManyRequests is not None and isinstance(error, TooManyRequests):
+        return True
+    return RATE_LIMIT_ERROR_PATTERN.search(str(error)) is not None
+
+# Function to fetch a transcript, retrying with exponential backoff when rate limited
+async def fetch_transcript(video_id, languages, limiter, max_retries):
+    attempt = 0
+    while True:
+        await limiter.acquire()
+        try:
+            return await asyncio.to_thread(YouTubeTranscriptApi.get_transcript, video_id, languages=languages)
+        except Exception as e:
+            if attempt >= max_retries or not is_rate_limit_error(e):
+                raise
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt) + random.uniform(0, 0.5)
+            logging.warning(f"Rate limited while fetching transcript for video {video_id}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
 
 # Function to fetch and save transcript using youtube_transcript_api
-def fetch_and_save_transcript(video_id, video_title, video_date, languages, dest_dir, format, include_timecodes):
+async def fetch_and_save_transcript(video_id, video_title, normalized_title, date_str, languages, dest_dir, format, include_timecodes, limiter, max_retries, overwrite):
+    file_extension = 'json' if format == 'json' else 'txt'
+    file_name = f"{normalized_title}-{date_str}.{file_extension}"
+    file_path = os.path.join(dest_dir, file_name)
+
+    # The file name is derived from the title and date, so an existing file means the transcript was already downloaded
+    if not overwrite and os.path.exists(file_path):
+        print(f"Transcription already exists for video {video_id} ({video_title}), skipping")
+        logging.info(f"Skipped video {video_id} ({video_title}), transcription already exists: {file_path}")
+        return True
+
     try:
-        transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=languages)
+        transcript = await fetch_transcript(video_id, languages, limiter, max_retries)
     except Exception as e:
         logging.error(f"An error occurred while fetching transcript for video {video_id}: {e}")
         print(f"No subtitles found for video {video_title}")
         return False
 
-    normalized_title = normalize_title(video_title)
-    date_str = datetime.strptime(video_date, '%Y-%m-%dT%H:%M:%SZ').strftime('%Y%m%d')
-    file_extension = 'json' if format == 'json' else 'txt'
-    file_name = f"{normalized_title}-{date_str}.{file_extension}"
-    file_path = os.path.join(dest_dir, file_name)
-    with open(file_path, 'w', encoding='utf-8') as file:
-        if format == 'json':
-            json.dump({'title': video_title, 'transcript': transcript}, file, ensure_ascii=False, indent=4)
-        else:
-            file.write(f"Title: {video_title}\n\n")
-            for line in transcript:
-                if include_timecodes:
-                    file.write(f"{line['start']} - {line['text']}\n")
-                else:
-                    file.write(f"{line['text']}\n")
+    try:
+        await asyncio.to_thread(write_transcript, file_path, video_id, video_title, transcript, format, include_timecodes)
+    except OSError as e:
+        logging.error(f"An error occurred while saving transcript for video {video_id}: {e}")
+        print(f"Failed to save transcription for video {video_title}")
+        return False
     
     print(f"Downloaded transcription for video {video_id} ({video_title})")
     logging.info(f"Downloaded transcription for video {video_id} ({video_title})")
     return True
 
+# Function to run a coroutine while holding a slot of the semaphore
+async def bounded(sem, coro):
+    async with sem:
+        return await coro
+
+# Function to download transcripts for several videos concurrently
+# Downloads for a page of videos start as soon as it arrives, while the next page is still being fetched
+async def download_transcripts(video_pages, languages, dest_dir, format, include_timecodes, concurrency, limiter, max_retries, overwrite):
+    sem = asyncio.Semaphore(concurrency)
+    videos = []
+    tasks = []
+    try:
+        async for page_videos in video_pages:
+            # Validate the whole page before scheduling it, so the workers only read precomputed fields
+            valid_videos = []
+            for video in page_videos:
+                try:
+                    video['_normalized_title'] = normalize_title(video['Title'])
+                    video['_date_str'] = format_date(video['Date'])
+                except (TypeError, ValueError) as e:
+                    logging.error(f"Skipping video {video['ID']} with malformed metadata: {e}")
+                    print(f"Skipping video {video['ID']}, malformed title or date")
+                    continue
+                valid_videos.append(video)
+
+            videos.extend(valid_videos)
+            tasks.extend(
+                asyncio.create_task(bounded(sem, fetch_and_save_transcript(video['ID'], video['Title'], video['_normalized_title'], video['_date_str'], languages, dest_dir, format, include_timecodes, limiter, max_retries, overwrite)))
+                for video in valid_videos
+            )
+    except Exception as e:
+        logging.error(f"Failed to fetch video IDs: {e}")
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Report errors that escaped fetch_and_save_transcript, gather only returns them
+    succeeded = 0
+    for video, result in zip(videos, results):
+        if isinstance(result, BaseException):
+            logging.error(f"Unexpected error while downloading transcript for video {video['ID']}: {result}", exc_info=result)
+        elif result:
+            succeeded += 1
+    failed = len(results) - succeeded
+    print(f"Finished: {succeeded} transcriptions downloaded or already present, {failed} failed.")
+    logging.info(f"Finished: {succeeded} transcriptions downloaded or already present, {failed} failed.")
+    return results
+
+# Function to download transcriptions for the requested channel or video
+async def download(args, dest_dir, youtube, limiter):
+    # Create destination directory if it doesn't exist
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    logging.info(f"Destination directory created: {dest_dir}")
+    print(f"Destination directory created: {dest_dir}")
+
+    if args.channel:
+        channel_name = args.channel.lstrip('@')
+        
+        # Check if channel exists
+        try:
+            channel = await get_channel_id(youtube, channel_name, limiter)
+        except HttpError as e:
+            logging.error(f"An HTTP error occurred: {e}")
+            print(f"An HTTP error occurred while looking up the channel: {args.channel}")
+            return
+        except Exception as e:
+            logging.error(f"Failed to look up the channel {args.channel}: {e}")
+            print(f"Failed to look up the channel {args.channel}: {e}")
+            return
+        if channel is None:
+            full_url = YOUTUBE_CHANNEL_URL + channel_name
+            logging.error(f"The channel does not exist: {args.channel}\nURL: {full_url}")
+            print(f"The channel does not exist: {args.channel}\nURL: {full_url}")
+            return
+        _, playlist_id = channel
+        
+        if args.list:
+            # Fetch video IDs
+            try:
+                videos = await fetch_video_ids(youtube, playlist_id, args.max_number_of_videos, args.include_shorts, limiter)
+            except Exception as e:
+                logging.error(f"Failed to fetch video IDs: {e}")
+                return
+            
+            print(f"Discovered {len(videos)} videos.")
+            print("Listing available subtitles and video information...")
+            for video in videos:
+                print(f"ID: {video['ID']}, Title: {video['Title']}, Date: {video['Date']}")
+            logging.info("Available subtitles: %s", videos)
+            logging.info(f"Number of videos: {len(videos)}")
+            most_recent_date = videos[0]['Date'] if videos else 'N/A'
+            logging.info(f"Most recent video date: {most_recent_date}")
+            return
+        
+        # Download transcriptions while the video IDs are still being fetched
+        print(f"Starting to download transcriptions for up to {args.max_number_of_videos} videos.")
+        languages = args.languages_of_subtitles.strip('[]').split(',')
+        video_pages = fetch_video_pages(youtube, playlist_id, args.max_number_of_videos, args.include_shorts, limiter)
+        await download_transcripts(video_pages, languages, dest_dir, args.format, args.time_codes, max(1, args.rate_limit * 2), limiter, args.max_retries, args.overwrite)
+    elif args.video_id:
+        # Download transcription for a single video
+        languages = args.languages_of_subtitles.strip('[]').split(',')
+        await fetch_and_save_transcript(args.video_id, args.video_id, normalize_title(args.video_id), datetime.now().strftime('%Y%m%d'), languages, dest_dir, args.format, args.time_codes, limiter, args.max_retries, args.overwrite)
+
 # Main function to handle command-line arguments and orchestrate the script's functionality
 def main():
     parser = argparse.ArgumentParser(description="Download YouTube video transcriptions.")
@@ -167,12 +445,14 @@ def main():
     parser.add_argument('--format', '-f', default='plain_text', choices=['plain_text', 'json'], help="Format for saving transcriptions. Default is plain_text.")
     parser.add_argument('--time-codes', '-t', action='store_true', help="Include time codes in the transcriptions. Disabled by default.")
     parser.add_argument('--rate-limit', '-r', type=int, default=5, help="API rate limit in calls per second. Default is 5.")
+    parser.add_argument('--max-retries', type=int, default=3, help="Maximum number of retries when a transcript request is rate limited. Default is 3.")
     parser.add_argument('--timeout', '-T', type=int, default=10, help="Timeout for API calls in seconds. Default is 10 seconds.")
     parser.add_argument('--log-level', '-L', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], help="Set the logging level. Default is INFO.")
     parser.add_argument('--log-format', '-F', default='plain_text', choices=['plain_text', 'json'], help="Format for logging output. Default is plain_text.")
     parser.add_argument('--list', action='store_true', help="List available subtitles, number of videos, and date of the most recent video.")
     parser.add_argument('--include-shorts', action='store_true', help="Include YouTube Shorts in the download.")
     parser.add_argument('--force-download', action='store_true', help="Force download the first available subtitle if the requested language is not found.")
+    parser.add_argument('--overwrite', action='store_true', help="Download transcriptions again even if the file already exists in the destination directory.")
     parser.add_argument('--console-log', action='store_true', help="Output log messages to console as well as log file.")
 
     args = parser.parse_args()
@@ -186,60 +466,12 @@ def main():
     # Setup logging
     dest_dir = Path(args.destination_directory)
     log_file = dest_dir / f"log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-    setup_logging(args.log_level, args.log_format, log_file, args.console_log)
+    log_listener = setup_logging(args.log_level, args.log_format, log_file, args.console_log)
+    atexit.register(log_listener.stop)
 
-    youtube = get_youtube_client()
-    
-    if args.channel:
-        channel_name = args.channel.lstrip('@')
-        
-        # Check if channel exists
-        try:
-            channel_id = get_channel_id(channel_name)
-        except Exception as e:
-            full_url = YOUTUBE_CHANNEL_URL + channel_name
-            logging.error(f"The channel does not exist: {args.channel}\nURL: {full_url}")
-            print(f"The channel does not exist: {args.channel}\nURL: {full_url}")
-            return
-        
-        # Create destination directory if it doesn't exist
-        dest_dir.mkdir(parents=True, exist_ok=True)
-        logging.info(f"Destination directory created: {dest_dir}")
-        print(f"Destination directory created: {dest_dir}")
-
-        # Fetch video IDs
-        try:
-            videos = fetch_video_ids(youtube, channel_name, args.max_number_of_videos, args.include_shorts)
-            logging.debug(f"Fetched video IDs: {videos}")
-        except Exception as e:
-            logging.error(f"Failed to fetch video IDs: {e}")
-            return
-        
-        if args.list:
-            print(f"Discovered {len(videos)} videos.")
-            print("Listing available subtitles and video information...")
-            for video in videos:
-                print(f"ID: {video['ID']}, Title: {video['Title']}, Date: {video['Date']}")
-            logging.info(f"Available subtitles: {videos}")
-            logging.info(f"Number of videos: {len(videos)}")
-            most_recent_date = videos[0]['Date'] if videos else 'N/A'
-            logging.info(f"Most recent video date: {most_recent_date}")
-            return
-        
-        # Download transcriptions
-        print(f"Starting to download transcriptions for {len(videos)} videos.")
-        languages = args.languages_of_subtitles.strip('[]').split(',')
-        for video in videos:
-            fetch_and_save_transcript(video['ID'], video['Title'], video['Date'], languages, dest_dir, args.format, args.time_codes)
-    elif args.video_id:
-        # Create destination directory if it doesn't exist
-        dest_dir.mkdir(parents=True, exist_ok=True)
-        logging.info(f"Destination directory created: {dest_dir}")
-        print(f"Destination directory created: {dest_dir}")
-
-        # Download transcription for a single video
-        languages = args.languages_of_subtitles.strip('[]').split(',')
-        fetch_and_save_transcript(args.video_id, args.video_id, datetime.now().strftime('%Y-%m-%dT%H:%M:%SZ'), languages, dest_dir, args.format, args.time_codes)
+    youtube = get_youtube_client(args.timeout)
+    limiter = AsyncRateLimiter(args.rate_limit)
+    asyncio.run(download(args, dest_dir, youtube, limiter))
 
 if __name__ == '__main__':
     main()